@@ -2,11 +2,44 @@
 WebSocket handler for real-time alerts
 """
 import asyncio
-import json
-from datetime import datetime
-from typing import Set, Dict, Any
+import functools
+import logging
+import time
+from typing import Dict, Any
+import orjson
 from fastapi import WebSocket, WebSocketDisconnect
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# (whole second, ISO-8601 UTC string) - alerts within the same second share it
+_iso_cache = (0, "")
+
+
+def _iso_timestamp() -> str:
+    """Current UTC time as ISO-8601, formatted at most once per second."""
+    global _iso_cache
+    t = int(time.time())
+    if t != _iso_cache[0]:
+        _iso_cache = (t, time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(t)))
+    return _iso_cache[1]
+
+
+# Status updates go out at analysis FPS with a fixed shape, so they are
+# spliced into a pre-encoded skeleton instead of running the JSON encoder
+_STATUS_TEMPLATE = (
+    b'{"type":"status","confidence":1.0,"timestamp":%s,"camera_id":%s,'
+    b'"message":"Status update","data":{"detecting":%s,"fps":%s,"bufferSize":%d}}'
+)
+
+# One-byte binary keep-alive frame shared by every client
+HEARTBEAT = b"\x01"
+
+# JSON-escaped, quoted string; camera IDs and per-second timestamps repeat
+_json_str = functools.lru_cache(maxsize=64)(orjson.dumps)
 
 
 @dataclass
@@ -19,11 +52,12 @@ class Alert:
     message: str
     data: Dict[str, Any] = None
 
-    def to_json(self) -> str:
-        d = asdict(self)
+    def to_json(self) -> bytes:
+        # Fields are flat, so the instance dict avoids asdict()'s deep copy
+        d = self.__dict__
         if d['data'] is None:
-            d['data'] = {}
-        return json.dumps(d)
+            d = {**d, 'data': {}}
+        return orjson.dumps(d)
 
 
 class ConnectionManager:
@@ -31,39 +65,54 @@ class ConnectionManager:
     Manages WebSocket connections for real-time alerts.
     """
 
-    def __init__(self):
-        self.active_connections: Set[WebSocket] = set()
-        self._lock = asyncio.Lock()
+    def __init__(self, batch_size: int = None):
+        """
+        Initialize the connection manager.
+
+        Args:
+            batch_size: Max concurrent sends per broadcast batch (default from settings)
+        """
+        # Keyed by id(websocket); single dict stores/pops are atomic under the
+        # GIL, so no lock is needed around registration or snapshots
+        self.active_connections: Dict[int, WebSocket] = {}
+        self.batch_size = batch_size or settings.ws_broadcast_batch_size
 
     async def connect(self, websocket: WebSocket):
         """Accept and register a new WebSocket connection."""
         await websocket.accept()
-        async with self._lock:
-            self.active_connections.add(websocket)
-        print(f"WebSocket connected. Total connections: {len(self.active_connections)}")
+        self.active_connections[id(websocket)] = websocket
+        logger.debug("WebSocket connected. Total connections: %d", len(self.active_connections))
 
     async def disconnect(self, websocket: WebSocket):
         """Remove a WebSocket connection."""
-        async with self._lock:
-            self.active_connections.discard(websocket)
-        print(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
+        self.active_connections.pop(id(websocket), None)
+        logger.debug("WebSocket disconnected. Total connections: %d", len(self.active_connections))
 
-    async def broadcast(self, message: str):
+    async def broadcast(self, message: bytes):
         """Send a message to all connected clients."""
         if not self.active_connections:
             return
 
-        disconnected = set()
-
-        async with self._lock:
-            for connection in self.active_connections:
-                try:
-                    await connection.send_text(message)
-                except Exception:
-                    disconnected.add(connection)
+        connections = list(self.active_connections.values())
 
-            # Clean up disconnected clients
-            self.active_connections -= disconnected
+        # Send in batches, yielding to the event loop between them so large
+        # fan-outs don't starve HTTP handlers
+        disconnected = set()
+        for i in range(0, len(connections), self.batch_size):
+            batch = connections[i:i + self.batch_size]
+            results = await asyncio.gather(
+                *(connection.send_bytes(message) for connection in batch),
+                return_exceptions=True
+            )
+            disconnected.update(
+                connection for connection, result in zip(batch, results)
+                if isinstance(result, Exception)
+            )
+            await asyncio.sleep(0)
+
+        # Clean up disconnected clients
+        for connection in disconnected:
+            self.active_connections.pop(id(connection), None)
 
     async def broadcast_alert(self, alert: Alert):
         """Broadcast an alert to all connected clients."""
@@ -85,15 +134,14 @@ class ConnectionManager:
             camera_id: Camera identifier
             description: Human-readable description
         """
-        alert = Alert(
-            type=detection_type,
-            confidence=confidence,
-            timestamp=datetime.now().isoformat(),
-            camera_id=camera_id,
-            message=description or f"{detection_type.title()} detected",
-            data={"source": "ai-detection"}
-        )
-        await self.broadcast_alert(alert)
+        await self.broadcast(orjson.dumps({
+            "type": detection_type,
+            "confidence": confidence,
+            "timestamp": _iso_timestamp(),
+            "camera_id": camera_id,
+            "message": description or f"{detection_type.title()} detected",
+            "data": {"source": "ai-detection"}
+        }))
 
     async def send_recording_alert(
         self,
@@ -113,20 +161,19 @@ class ConnectionManager:
             transaction_hash: Blockchain transaction hash
             filepath: Path to saved video
         """
-        alert = Alert(
-            type="recording",
-            confidence=1.0,
-            timestamp=datetime.now().isoformat(),
-            camera_id=camera_id,
-            message=f"Recording {status}",
-            data={
+        await self.broadcast(orjson.dumps({
+            "type": "recording",
+            "confidence": 1.0,
+            "timestamp": _iso_timestamp(),
+            "camera_id": camera_id,
+            "message": f"Recording {status}",
+            "data": {
                 "status": status,
                 "videoHash": video_hash,
                 "transactionHash": transaction_hash,
                 "filepath": filepath
             }
-        )
-        await self.broadcast_alert(alert)
+        }))
 
     async def send_status_update(
         self,
@@ -144,19 +191,25 @@ class ConnectionManager:
             fps: Current processing FPS
             buffer_size: Current buffer size in frames
         """
-        alert = Alert(
-            type="status",
-            confidence=1.0,
-            timestamp=datetime.now().isoformat(),
-            camera_id=camera_id,
-            message="Status update",
-            data={
-                "detecting": is_detecting,
-                "fps": round(fps, 1),
-                "bufferSize": buffer_size
-            }
-        )
-        await self.broadcast_alert(alert)
+        await self.broadcast(_STATUS_TEMPLATE % (
+            _json_str(_iso_timestamp()),
+            _json_str(camera_id),
+            b"true" if is_detecting else b"false",
+            f"{fps:.1f}".encode(),
+            buffer_size
+        ))
+
+    async def heartbeat_loop(self, interval: float):
+        """
+        Broadcast a heartbeat to all clients every `interval` seconds.
+        One timer for the whole server instead of a receive timeout per socket.
+
+        Args:
+            interval: Seconds between heartbeats
+        """
+        while True:
+            await asyncio.sleep(interval)
+            await self.broadcast(HEARTBEAT)
 
     @property
     def connection_count(self) -> int:
@@ -19,6 +19,9 @@ class Settings(BaseSettings):
     # Detection settings
     detection_threshold: float = 0.6
     analysis_fps: int = 5  # Frames per second to analyze
+    analysis_max_dim: int = 320  # Longest side frames are downsampled to for motion analysis
+    motion_green_channel: bool = False  # Motion on the green channel instead of luminance
+    motion_use_numba: bool = False  # Numba motion kernel (if installed) instead of OpenCV
     buffer_duration_seconds: int = 5  # 5 seconds pre-event buffer
     post_incident_duration_seconds: int = 5  # 5 seconds post-event recording
 
@@ -29,11 +32,13 @@ class Settings(BaseSettings):
     # Backend integration
     backend_url: str = "http://localhost:5000"
     backend_timeout_seconds: int = 30
+    upload_queue_size: int = 32  # Recordings waiting to upload before new ones are skipped
 
     # Storage
     recordings_dir: Path = Path(__file__).parent.parent / "recordings"
     max_recordings_gb: int = 10
     retention_days: int = 7
+    compute_file_hash: bool = True  # Hash the MP4 file (backend verifies file bytes); else use content hash
 
     # Gemini VLM (Forensic Report Generation)
     gemini_api_key: str = ""
@@ -50,6 +55,7 @@ class Settings(BaseSettings):
     # WebSocket
     ws_heartbeat_interval: int = 30
     max_ws_connections: int = 100
+    ws_broadcast_batch_size: int = 50  # Concurrent sends per broadcast batch
 
     class Config:
         env_file = ".env"
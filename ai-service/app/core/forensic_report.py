@@ -7,6 +7,7 @@ import base64
 import cv2
 import hashlib
 import json
+import logging
 import os
 import time
 from dataclasses import dataclass, field, asdict
@@ -20,6 +21,8 @@ try:
 except ImportError:
     HAS_GENAI = False
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class ForensicReport:
@@ -155,7 +158,7 @@ Respond ONLY with valid JSON in this exact format:
             return json.loads(text)
 
         except Exception as e:
-            print(f"Gemini analysis failed: {e}")
+            logger.error("Gemini analysis failed: %s", e)
             return self._fallback_analysis(context)
 
     def _fallback_analysis(self, context: dict) -> dict:
@@ -43,6 +43,29 @@ class HashUploader:
         self.backend_url = backend_url or settings.backend_url
         self.timeout = timeout or settings.backend_timeout_seconds
 
+        # Long-lived client so uploads reuse keep-alive connections. Its pool
+        # is bound to the server's event loop, so only use it from there
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _new_client(self) -> httpx.AsyncClient:
+        """Create an HTTP client with the uploader's settings."""
+        return httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_keepalive_connections=8)
+        )
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the shared HTTP client, creating it on first use."""
+        if self._client is None:
+            self._client = self._new_client()
+        return self._client
+
+    async def aclose(self):
+        """Close the shared HTTP client."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
     async def upload_recording(self, recording: IncidentRecording) -> UploadResult:
         """
         Upload an incident recording to the backend.
@@ -53,54 +76,55 @@ class HashUploader:
         Returns:
             UploadResult with blockchain transaction details
         """
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                # Read video file
-                with open(recording.filepath, "rb") as f:
-                    video_data = f.read()
+        return await self._upload(self._get_client(), recording)
 
-                # Prepare multipart form data
+    async def _upload(self, client: httpx.AsyncClient, recording: IncidentRecording) -> UploadResult:
+        """Upload a recording over the given client (see upload_recording)."""
+        try:
+            # Prepare multipart form data
+            data = {
+                "cameraId": recording.camera_id,
+                "detectionType": recording.detection_type,
+                "eventType": recording.event_type or recording.detection_type,
+                "confidenceScore": str(int(recording.confidence * 10000)),
+                "aiModelVersion": recording.ai_model_version or "",
+                "reportHash": recording.report_hash or "0x" + "0" * 64,
+                "perceptualHash": recording.perceptual_hash or "0x" + "0" * 64,
+            }
+
+            # POST to backend - httpx streams the open file in chunks rather
+            # than holding the whole video in memory
+            with open(recording.filepath, "rb") as f:
                 files = {
-                    "video": (recording.filepath.name, video_data, "video/mp4")
+                    "video": (recording.filepath.name, f, "video/mp4")
                 }
-                data = {
-                    "cameraId": recording.camera_id,
-                    "detectionType": recording.detection_type,
-                    "eventType": recording.event_type or recording.detection_type,
-                    "confidenceScore": str(int(recording.confidence * 10000)),
-                    "aiModelVersion": recording.ai_model_version or "",
-                    "reportHash": recording.report_hash or "0x" + "0" * 64,
-                    "perceptualHash": recording.perceptual_hash or "0x" + "0" * 64,
-                }
-
-                # POST to backend
                 response = await client.post(
                     f"{self.backend_url}/api/record",
                     files=files,
                     data=data
                 )
 
-                if response.status_code == 200:
-                    result = response.json()
-                    return UploadResult(
-                        success=True,
-                        video_hash=result.get("videoHash", recording.video_hash),
-                        transaction_hash=result.get("transactionHash"),
-                        block_number=result.get("blockNumber")
-                    )
-                else:
-                    error_msg = response.text
-                    try:
-                        error_data = response.json()
-                        error_msg = error_data.get("error", error_msg)
-                    except:
-                        pass
-
-                    return UploadResult(
-                        success=False,
-                        video_hash=recording.video_hash,
-                        error=f"Backend error ({response.status_code}): {error_msg}"
-                    )
+            if response.status_code == 200:
+                result = response.json()
+                return UploadResult(
+                    success=True,
+                    video_hash=result.get("videoHash", recording.video_hash),
+                    transaction_hash=result.get("transactionHash"),
+                    block_number=result.get("blockNumber")
+                )
+            else:
+                error_msg = response.text
+                try:
+                    error_data = response.json()
+                    error_msg = error_data.get("error", error_msg)
+                except:
+                    pass
+
+                return UploadResult(
+                    success=False,
+                    video_hash=recording.video_hash,
+                    error=f"Backend error ({response.status_code}): {error_msg}"
+                )
 
         except httpx.TimeoutException:
             return UploadResult(
@@ -131,7 +155,13 @@ class HashUploader:
         Returns:
             UploadResult
         """
-        return asyncio.run(self.upload_recording(recording))
+        async def upload_once():
+            # Runs on a throwaway loop, so use a client of its own rather
+            # than the shared one bound to the server loop
+            async with self._new_client() as client:
+                return await self._upload(client, recording)
+
+        return asyncio.run(upload_once())
 
     async def verify_hash(self, video_hash: str) -> dict:
         """
@@ -144,16 +174,15 @@ class HashUploader:
             Verification result from backend
         """
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.backend_url}/api/verify",
-                    json={"videoHash": video_hash}
-                )
+            response = await self._get_client().post(
+                f"{self.backend_url}/api/verify",
+                json={"videoHash": video_hash}
+            )
 
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    return {"verified": False, "error": response.text}
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {"verified": False, "error": response.text}
 
         except Exception as e:
             return {"verified": False, "error": str(e)}
@@ -166,8 +195,7 @@ class HashUploader:
             True if backend is healthy
         """
         try:
-            async with httpx.AsyncClient(timeout=5) as client:
-                response = await client.get(f"{self.backend_url}/api/logs")
-                return response.status_code == 200
+            response = await self._get_client().get(f"{self.backend_url}/api/logs", timeout=5)
+            return response.status_code == 200
         except:
             return False
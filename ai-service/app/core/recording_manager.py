@@ -5,11 +5,18 @@ Records entire event duration: pre-buffer + event + post-buffer
 """
 import cv2
 import hashlib
+import itertools
+import logging
+import mmap
+import os
+import queue
+import tempfile
 import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Callable
+from typing import Optional, Callable
 from dataclasses import dataclass
 import numpy as np
 
@@ -17,6 +24,8 @@ from .video_buffer import VideoBuffer, BufferedFrame
 from ..config import settings
 from ..utils.phash import compute_video_phash
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class IncidentRecording:
@@ -30,6 +39,7 @@ class IncidentRecording:
     detection_type: str
     confidence: float
     perceptual_hash: str = ""
+    content_hash: str = ""  # SHA-256 of raw frame pixels, not the MP4 bytes
     report_hash: str = ""
     ai_model_version: str = ""
     event_type: str = ""
@@ -42,6 +52,8 @@ class RecordingManager:
     Records: pre-buffer (5s) + entire event duration + post-buffer (5s)
     """
 
+    _codec: Optional[str] = None  # MP4 fourcc, probed once per process
+
     def __init__(
         self,
         buffer: VideoBuffer,
@@ -69,16 +81,24 @@ class RecordingManager:
         self._lock = threading.Lock()
         self._is_recording = False
         self._event_active = False  # True while event is ongoing
-        self._recording_thread: Optional[threading.Thread] = None
-        self._event_frames: List[np.ndarray] = []  # Frames during event
-        self._pre_frames: List[np.ndarray] = []  # Pre-event buffer frames
+        # One event at a time: the recording worker plus its encoder
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rec")
+        self._enc_future: Optional[Future] = None
+        self._enc_queue: Optional[queue.Queue] = None  # Event frames waiting to be encoded
+        self._frames_written = 0
+        self._frames_dropped = 0
+        self._content_hash = ""
+        self._event_filepath: Optional[Path] = None
+        self._event_time: Optional[datetime] = None
         self._current_detection_type = ""
         self._current_confidence = 0.0
-        self._last_detection_time = 0.0
+        self._detection_event = threading.Event()  # Set on every detection during an event
 
         # Ensure recordings directory exists
         self.recordings_dir.mkdir(parents=True, exist_ok=True)
 
+        self._probe_codec()
+
     def start_event(
         self,
         detection_type: str = "violence",
@@ -97,31 +117,40 @@ class RecordingManager:
         """
         with self._lock:
             if self._is_recording:
-                # Already recording - just update the last detection time
-                self._last_detection_time = time.time()
+                # Already recording - signal the worker that detection continues
                 self._current_confidence = max(self._current_confidence, confidence)
+                self._detection_event.set()
                 return False
 
             self._is_recording = True
             self._event_active = True
             self._current_detection_type = detection_type
             self._current_confidence = confidence
-            self._last_detection_time = time.time()
-            self._event_frames = []
-
-            # Capture pre-event buffer immediately
-            pre_buffer = self.buffer.get_frames()
-            self._pre_frames = [f.frame.copy() for f in pre_buffer]
+            self._detection_event.set()
+
+            # Pin the pre-event window now; the encoder copies it out of the
+            # ring, so add_frame() never waits on that copy
+            pre_lo, pre_hi = self.buffer.snapshot()
+
+            # Encode while the event is still being captured
+            self._event_time = datetime.now()
+            filename = f"{detection_type}_{self._event_time.strftime('%Y%m%d_%H%M%S')}.mp4"
+            self._event_filepath = self.recordings_dir / filename
+            self._frames_written = 0
+            self._frames_dropped = 0
+            self._content_hash = ""
+            # Room for every live frame that arrives while the encoder is
+            # still writing the pre-buffer, plus a margin
+            self._enc_queue = queue.Queue(maxsize=(pre_hi - pre_lo) + 2 * self.fps)
+            self._enc_future = self._executor.submit(
+                self._encoder_worker, self._enc_queue, pre_lo, pre_hi, self._event_filepath
+            )
 
-        print(f"Event started: {detection_type} (confidence: {confidence:.2f})")
-        print(f"Pre-buffer captured: {len(self._pre_frames)} frames")
+        logger.info("Event started: %s (confidence: %.2f)", detection_type, confidence)
+        logger.debug("Pre-buffer captured: %d frames", pre_hi - pre_lo)
 
         # Start the recording worker
-        self._recording_thread = threading.Thread(
-            target=self._recording_worker,
-            daemon=True
-        )
-        self._recording_thread.start()
+        self._executor.submit(self._recording_worker)
 
         return True
 
@@ -132,9 +161,9 @@ class RecordingManager:
         """
         with self._lock:
             if self._is_recording:
-                self._last_detection_time = time.time()
                 self._current_confidence = max(self._current_confidence, confidence)
                 self._event_active = True
+                self._detection_event.set()
 
     def add_frame(self, frame: np.ndarray):
         """
@@ -143,51 +172,114 @@ class RecordingManager:
         """
         if self._is_recording:
             with self._lock:
-                self._event_frames.append(frame.copy())
+                enc_queue = self._enc_queue
+                if enc_queue is None:
+                    return
+                try:
+                    # Wait up to one frame interval for the encoder to catch up
+                    enc_queue.put(frame, timeout=1.0 / self.fps)
+                except queue.Full:
+                    # Encoder far behind - the frame is lost; say so
+                    self._frames_dropped += 1
+                    if self._frames_dropped == 1:
+                        logger.warning("Encoder queue full, dropping event frames")
+
+    def _encoder_worker(self, enc_queue: queue.Queue, pre_lo: int, pre_hi: int, filepath: Path):
+        """
+        Background encoder: writes pre-buffer, then event frames until None arrives.
+        Hashes the raw pixels of every written frame alongside encoding, so the
+        content hash is ready as soon as the writer is released.
+        """
+        writer = None
+        content_hash = hashlib.sha256()
+        try:
+            # Copy the pre-event window out of the ring first thing: writing
+            # it takes far longer than the ring takes to reuse its slots
+            pre_frames = self.buffer.copy_frames(pre_lo, pre_hi)
+            if len(pre_frames) < pre_hi - pre_lo:
+                logger.warning("Pre-buffer lost %d frames to the ring while copying",
+                               pre_hi - pre_lo - len(pre_frames))
+            for frame in itertools.chain(pre_frames, self._drain(enc_queue)):
+                if writer is None:
+                    writer = self._open_writer(filepath, frame)
+                writer.write(frame)
+                content_hash.update(np.ascontiguousarray(frame))
+                self._frames_written += 1
+            self._content_hash = "0x" + content_hash.hexdigest()
+        except Exception as e:
+            logger.error("Encoder error: %s", e)
+            # Keep draining so the end-of-event sentinel can always be queued,
+            # then fail the future so the recording is not saved
+            while enc_queue.get() is not None:
+                pass
+            raise
+        finally:
+            if writer is not None:
+                writer.release()
+
+    @staticmethod
+    def _drain(enc_queue: queue.Queue):
+        """Yield queued frames until the None sentinel (iter(get, None) would compare arrays with ==)."""
+        while True:
+            frame = enc_queue.get()
+            if frame is None:
+                return
+            yield frame
 
     def _recording_worker(self):
         """Background worker that waits for event to end, then saves."""
         try:
             # Wait for event to end (no detection for post_incident_duration)
             while True:
-                time.sleep(0.1)
+                self._detection_event.clear()
+                if not self._detection_event.wait(self.post_incident_duration):
+                    break
 
-                with self._lock:
-                    time_since_last = time.time() - self._last_detection_time
-
-                    # Event ended if no detection for post_incident_duration
-                    if time_since_last >= self.post_incident_duration:
-                        self._event_active = False
-                        break
+            with self._lock:
+                self._event_active = False
 
-            # Collect final post-event frames (already included in event_frames)
+            # Collect final post-event frames (already queued to the encoder)
             # Wait a tiny bit more to ensure we have post-buffer
             time.sleep(0.5)
 
+            # Stop feeding the encoder, then let it flush and close the file
             with self._lock:
-                all_frames = self._pre_frames + self._event_frames
-
-            if len(all_frames) < 10:
-                print("Not enough frames to save recording")
+                enc_queue = self._enc_queue
+                self._enc_queue = None
+            enc_queue.put(None)
+            timestamp = self._event_time
+            filepath = self._event_filepath
+            try:
+                self._enc_future.result()
+            except Exception:
+                # Don't leave a truncated video behind for upload
+                filepath.unlink(missing_ok=True)
+                raise
+
+            frame_count = self._frames_written
+            if self._frames_dropped:
+                logger.warning("Dropped %d event frames the encoder could not keep up with",
+                               self._frames_dropped)
+
+            if frame_count < 10:
+                logger.warning("Not enough frames to save recording")
+                filepath.unlink(missing_ok=True)
                 return
 
-            # Generate filename
-            timestamp = datetime.now()
-            filename = f"{self._current_detection_type}_{timestamp.strftime('%Y%m%d_%H%M%S')}.mp4"
-            filepath = self.recordings_dir / filename
-
-            # Save video
-            self._save_video(all_frames, filepath)
-
-            # Calculate hashes
-            video_hash = self._calculate_hash(filepath)
+            # The backend re-hashes the uploaded file bytes, so the on-chain
+            # video hash must be the file hash unless that is switched off
+            content_hash = self._content_hash
+            if settings.compute_file_hash:
+                video_hash = self._hash_file(filepath)
+            else:
+                video_hash = content_hash
 
             # Compute perceptual hash
             perceptual_hash = ""
             try:
                 perceptual_hash = compute_video_phash(str(filepath))
             except Exception as e:
-                print(f"pHash computation failed: {e}")
+                logger.error("pHash computation failed: %s", e)
 
             # Create recording info
             recording = IncidentRecording(
@@ -195,31 +287,36 @@ class RecordingManager:
                 video_hash=video_hash,
                 camera_id=settings.camera_id,
                 timestamp=timestamp.timestamp(),
-                duration=len(all_frames) / self.fps,
-                frame_count=len(all_frames),
+                duration=frame_count / self.fps,
+                frame_count=frame_count,
                 detection_type=self._current_detection_type,
                 confidence=self._current_confidence,
                 perceptual_hash=perceptual_hash,
+                content_hash=content_hash,
                 event_type=self._current_detection_type
             )
 
-            print(f"Recording saved: {filepath}")
-            print(f"Hash: {video_hash}")
-            print(f"Duration: {recording.duration:.1f}s, Frames: {recording.frame_count}")
+            logger.info("Recording saved: %s", filepath)
+            logger.info("Hash: %s", video_hash)
+            logger.debug("Content hash: %s", content_hash)
+            logger.info("Duration: %.1fs, Frames: %d", recording.duration, recording.frame_count)
 
             # Callback
             if self.on_recording_complete:
                 self.on_recording_complete(recording)
 
         except Exception as e:
-            print(f"Recording error: {e}")
+            logger.error("Recording error: %s", e)
 
         finally:
             with self._lock:
                 self._is_recording = False
                 self._event_active = False
-                self._event_frames = []
-                self._pre_frames = []
+                enc_queue = self._enc_queue
+                self._enc_queue = None
+            if enc_queue is not None:
+                # Worker failed before signalling the encoder - release it
+                enc_queue.put(None)
 
     @property
     def is_recording(self) -> bool:
@@ -236,48 +333,68 @@ class RecordingManager:
         if self._is_recording:
             return False
 
-        # Start a short test event
+        # Start a short test event - no continue_event, so it ends naturally
+        # after post_incident_duration
         self.start_event(detection_type="manual_test", confidence=1.0)
-
-        # Auto-end after 2 seconds
-        def end_test():
-            time.sleep(2)
-            # Don't call continue_event - let it naturally end
-
-        threading.Thread(target=end_test, daemon=True).start()
         return True
 
-    def _save_video(self, frames: List[np.ndarray], filepath: Path):
+    def shutdown(self):
+        """Stop accepting new recording work (in-flight recordings keep running)."""
+        self._executor.shutdown(wait=False)
+
+    def _open_writer(self, filepath: Path, frame: np.ndarray) -> cv2.VideoWriter:
         """
-        Save frames as MP4 video.
+        Open an MP4 writer sized to the given frame, using the codec chosen
+        by _probe_codec().
 
         Args:
-            frames: List of frames (numpy arrays)
             filepath: Output file path
+            frame: First frame to be written (determines resolution)
         """
-        if not frames:
-            return
-
-        height, width = frames[0].shape[:2]
-
-        # Use mp4v codec for compatibility
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        height, width = frame.shape[:2]
         writer = cv2.VideoWriter(
             str(filepath),
-            fourcc,
+            cv2.VideoWriter_fourcc(*self._codec),
             self.fps,
             (width, height)
         )
-
-        try:
-            for frame in frames:
-                writer.write(frame)
-        finally:
+        if not writer.isOpened():
             writer.release()
+            raise RuntimeError(f"Could not open video writer for {filepath}")
+        return writer
+
+    @classmethod
+    def _probe_codec(cls) -> str:
+        """
+        Pick the MP4 codec once per process.
 
-    def _calculate_hash(self, filepath: Path) -> str:
+        Prefers H.264 (avc1), which uses a hardware encoder where the OpenCV
+        build provides one, and falls back to mp4v for compatibility. Builds
+        without H.264 log an error each time avc1 fails to open, so this is
+        tried once with a tiny throwaway file rather than per recording.
+        """
+        if cls._codec is None:
+            cls._codec = "mp4v"
+            with tempfile.TemporaryDirectory() as tmp:
+                writer = cv2.VideoWriter(
+                    os.path.join(tmp, "probe.mp4"),
+                    cv2.VideoWriter_fourcc(*"avc1"),
+                    30,
+                    (64, 64)
+                )
+                if writer.isOpened():
+                    cls._codec = "avc1"
+                writer.release()
+            logger.info("Recording codec: %s", cls._codec)
+        return cls._codec
+
+    def _hash_file(self, filepath: Path) -> str:
         """
-        Calculate SHA-256 hash of video file.
+        Calculate SHA-256 hash of a file.
+
+        Uses hashlib.file_digest (Python 3.11+), which reads into a large
+        buffer and keeps the loop in C; older versions hash an mmap of the
+        whole file in a single update().
 
         Args:
             filepath: Path to video file
@@ -285,13 +402,15 @@ class RecordingManager:
         Returns:
             Hash string with 0x prefix (for blockchain compatibility)
         """
-        sha256_hash = hashlib.sha256()
-
         with open(filepath, "rb") as f:
-            for chunk in iter(lambda: f.read(8192), b""):
-                sha256_hash.update(chunk)
+            if hasattr(hashlib, "file_digest"):
+                return "0x" + hashlib.file_digest(f, "sha256").hexdigest()
 
-        return "0x" + sha256_hash.hexdigest()
+            sha256_hash = hashlib.sha256()
+            if filepath.stat().st_size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    sha256_hash.update(mm)
+            return "0x" + sha256_hash.hexdigest()
 
     @property
     def is_recording(self) -> bool:
@@ -308,7 +427,9 @@ class RecordingManager:
         max_age_days = max_age_days or settings.retention_days
         cutoff_time = time.time() - (max_age_days * 24 * 60 * 60)
 
-        for filepath in self.recordings_dir.glob("*.mp4"):
-            if filepath.stat().st_mtime < cutoff_time:
-                filepath.unlink()
-                print(f"Deleted old recording: {filepath.name}")
+        # DirEntry.stat() reuses data from the directory read where possible
+        with os.scandir(self.recordings_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".mp4") and entry.stat().st_mtime < cutoff_time:
+                    os.unlink(entry.path)
+                    logger.info("Deleted old recording: %s", entry.name)
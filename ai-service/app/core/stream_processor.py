@@ -3,12 +3,15 @@ Video Stream Processor
 Handles video input from webcam, file, or RTSP stream
 """
 import cv2
+import logging
 import threading
 import time
 from typing import Callable, Optional
 import numpy as np
 from ..config import settings
 
+logger = logging.getLogger(__name__)
+
 
 class StreamProcessor:
     """
@@ -49,9 +52,21 @@ class StreamProcessor:
         self.frame_count = 0
         self.actual_fps = 0.0
         self.last_frame: Optional[np.ndarray] = None
-        self._fps_start_time = time.time()
+        self._fps_start_time = time.monotonic()
         self._fps_frame_count = 0
 
+    @property
+    def source(self) -> str:
+        """Video source as configured (device index, file path or URL)."""
+        return self._source
+
+    @source.setter
+    def source(self, source: str):
+        # Parse once here rather than on every (re)connect or read failure
+        self._source = source
+        self._cv_source = int(source) if source.isdigit() else source
+        self._is_file_like = isinstance(self._cv_source, str)
+
     def start(self) -> bool:
         """
         Start processing the video stream.
@@ -63,17 +78,11 @@ class StreamProcessor:
             if self._running:
                 return True
 
-            # Parse source
-            if self.source.isdigit():
-                source = int(self.source)
-            else:
-                source = self.source
-
             # Open video capture
-            self._capture = cv2.VideoCapture(source)
+            self._capture = cv2.VideoCapture(self._cv_source)
 
             if not self._capture.isOpened():
-                print(f"Failed to open video source: {self.source}")
+                logger.error("Failed to open video source: %s", self.source)
                 return False
 
             # Get source properties
@@ -85,7 +94,7 @@ class StreamProcessor:
             self._thread = threading.Thread(target=self._process_loop, daemon=True)
             self._thread.start()
 
-            print(f"Stream started: {self.source} @ {self.target_fps} FPS")
+            logger.info("Stream started: %s @ %d FPS", self.source, self.target_fps)
             return True
 
     def stop(self):
@@ -101,64 +110,83 @@ class StreamProcessor:
             self._capture.release()
             self._capture = None
 
-        print("Stream stopped")
+        logger.info("Stream stopped")
 
     def _process_loop(self):
         """Main processing loop."""
         frame_interval = 1.0 / self.target_fps
         analysis_interval = 1.0 / self.analysis_fps
-        last_analysis_time = 0
+        last_analysis_time = float("-inf")
+        next_deadline = time.monotonic()
 
         while self._running:
-            loop_start = time.time()
-
-            # Read frame
-            ret, frame = self._capture.read()
+            loop_start = time.monotonic()
+
+            # More than two frames behind schedule: restart the schedule from
+            # now and skip analysis for this frame. A slow source looks the
+            # same as a backlog here (grab() blocks at its real rate), so the
+            # frame itself is still decoded and buffered - never drop evidence
+            behind = loop_start > next_deadline + 2 * frame_interval
+            if behind:
+                next_deadline = loop_start
+
+            # Grab every iteration to stay in sync with the stream, but only
+            # decode when a callback will actually consume the frame
+            analysis_due = (
+                not behind
+                and self.on_analysis_frame is not None
+                and loop_start - last_analysis_time >= analysis_interval
+            )
+            ret = self._capture.grab()
+            frame = None
+            if ret and (self.on_frame is not None or analysis_due):
+                ret, frame = self._capture.retrieve()
 
             if not ret:
                 # End of video file or stream error
-                if isinstance(self.source, str) and not self.source.isdigit():
+                if self._is_file_like:
                     # Video file ended - loop or stop
                     self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
                     continue
                 else:
                     # Stream error - try to reconnect
-                    print("Stream error, attempting reconnect...")
+                    logger.warning("Stream error, attempting reconnect...")
                     time.sleep(1)
                     self._reconnect()
                     continue
 
             self.frame_count += 1
-            self.last_frame = frame
+            if frame is not None:
+                self.last_frame = frame
 
             # Update FPS calculation
             self._fps_frame_count += 1
-            elapsed = time.time() - self._fps_start_time
+            now = time.monotonic()
+            elapsed = now - self._fps_start_time
             if elapsed >= 1.0:
                 self.actual_fps = self._fps_frame_count / elapsed
                 self._fps_frame_count = 0
-                self._fps_start_time = time.time()
+                self._fps_start_time = now
 
             # Callback for every frame (buffer)
-            if self.on_frame is not None:
+            if self.on_frame is not None and frame is not None:
                 try:
                     self.on_frame(frame)
                 except Exception as e:
-                    print(f"Frame callback error: {e}")
+                    logger.error("Frame callback error: %s", e)
 
             # Callback for analysis frames (detection)
-            current_time = time.time()
-            if current_time - last_analysis_time >= analysis_interval:
-                if self.on_analysis_frame is not None:
-                    try:
-                        self.on_analysis_frame(frame)
-                    except Exception as e:
-                        print(f"Analysis callback error: {e}")
-                last_analysis_time = current_time
-
-            # Frame rate limiting
-            elapsed = time.time() - loop_start
-            sleep_time = frame_interval - elapsed
+            if analysis_due:
+                try:
+                    self.on_analysis_frame(frame)
+                except Exception as e:
+                    logger.error("Analysis callback error: %s", e)
+                last_analysis_time = loop_start
+
+            # Frame rate limiting against a fixed schedule so sleep jitter
+            # doesn't accumulate
+            next_deadline += frame_interval
+            sleep_time = next_deadline - time.monotonic()
             if sleep_time > 0:
                 time.sleep(sleep_time)
 
@@ -167,17 +195,12 @@ class StreamProcessor:
         if self._capture is not None:
             self._capture.release()
 
-        if self.source.isdigit():
-            source = int(self.source)
-        else:
-            source = self.source
-
-        self._capture = cv2.VideoCapture(source)
+        self._capture = cv2.VideoCapture(self._cv_source)
 
         if self._capture.isOpened():
-            print("Reconnected to stream")
+            logger.info("Reconnected to stream")
         else:
-            print("Reconnection failed")
+            logger.warning("Reconnection failed")
 
     def get_frame(self) -> Optional[np.ndarray]:
         """Get the most recent frame."""
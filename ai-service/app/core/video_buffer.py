@@ -2,9 +2,7 @@
 Circular video buffer for storing rolling footage
 Maintains the last N seconds of video frames for incident capture
 """
-import threading
 import time
-from collections import deque
 from dataclasses import dataclass
 from typing import List, Tuple, Optional
 import numpy as np
@@ -14,7 +12,7 @@ import numpy as np
 class BufferedFrame:
     """A single frame with metadata"""
     frame: np.ndarray
-    timestamp: float
+    timestamp: float  # time.monotonic() when buffered
     frame_number: int
 
 
@@ -22,24 +20,47 @@ class VideoBuffer:
     """
     Thread-safe circular buffer for video frames.
     Automatically maintains a rolling window of the last N seconds.
+
+    Frames are stored in a single preallocated (capacity, H, W, C) array that
+    is allocated once the first frame's shape is known, so adding a frame is
+    one memcpy into a ring slot with no allocation.
+
+    Single producer (the stream thread calling add_frame), lock-free: the
+    producer fills a slot and then publishes it by advancing _head; readers
+    snapshot _head/_tail and read slots below _head. Plain int attribute
+    stores are atomic under the GIL. One spare slot keeps the producer's
+    next write outside any window a reader can see.
+
+    get_frames()/get_recent_frames() return copies. get_frames_as_array()
+    returns a view of live ring slots by default: the producer starts
+    overwriting its oldest frame about one frame period (plus
+    headroom_seconds) later, so only use it for immediate work and pass
+    copy=True to keep the frames.
     """
 
-    def __init__(self, duration_seconds: int = 60, fps: int = 30):
+    def __init__(self, duration_seconds: int = 60, fps: int = 30, headroom_seconds: int = 0):
         """
         Initialize the video buffer.
 
         Args:
             duration_seconds: How many seconds of video to keep
             fps: Expected frames per second (used to calculate capacity)
+            headroom_seconds: Extra ring slots beyond the window: how much
+                longer a view from get_frames_as_array() stays intact after
+                its oldest frame leaves the window, and how long
+                copy_frames() has to copy a snapshot() in full
         """
         self.duration_seconds = duration_seconds
         self.fps = fps
         self.max_frames = duration_seconds * fps
+        self.capacity = self.max_frames + headroom_seconds * fps + 1
 
-        self._buffer: deque = deque(maxlen=self.max_frames)
-        self._lock = threading.RLock()
-        self._frame_count = 0
-        self._start_time = time.time()
+        self._frames: Optional[np.ndarray] = None  # (capacity, H, W, C), allocated on first frame
+        self._ts = np.zeros(self.capacity, dtype=np.float64)
+        self._fn = np.zeros(self.capacity, dtype=np.int64)
+        self._head = 0  # Total frames ever published; next slot is head % capacity
+        self._tail = 0  # Oldest logical frame still valid (advanced by clear)
+        self._start_time = time.monotonic()
 
     def add_frame(self, frame: np.ndarray) -> None:
         """
@@ -48,51 +69,148 @@ class VideoBuffer:
         Args:
             frame: numpy array representing the video frame (BGR format)
         """
-        with self._lock:
-            buffered = BufferedFrame(
-                frame=frame.copy(),  # Copy to avoid reference issues
-                timestamp=time.time(),
-                frame_number=self._frame_count
+        head = self._head
+        if (self._frames is None or self._frames.shape[1:] != frame.shape
+                or self._frames.dtype != frame.dtype):
+            # First frame or resolution change - (re)allocate the ring
+            self._frames = np.empty((self.capacity,) + frame.shape, dtype=frame.dtype)
+            self._tail = head
+
+        idx = head % self.capacity
+        np.copyto(self._frames[idx], frame)
+        self._ts[idx] = time.monotonic()
+        self._fn[idx] = head
+        self._head = head + 1  # Publish the slot
+
+    def _window(self) -> Tuple[int, int]:
+        """Snapshot of the logical [lo, hi) frame range currently in the window."""
+        hi = self._head
+        return max(self._tail, hi - self.max_frames), hi
+
+    def _ring_slice(self, ring: np.ndarray, lo: int, hi: int) -> np.ndarray:
+        """
+        Rows of a ring array for logical range [lo, hi), oldest first.
+        A zero-copy view unless the range wraps, then a single concatenate.
+        """
+        start = lo % self.capacity
+        end = start + (hi - lo)
+        if end <= self.capacity:
+            return ring[start:end]
+        return np.concatenate((ring[start:], ring[:end - self.capacity]), axis=0)
+
+    def _last_seconds(self, lo: int, hi: int, seconds: int) -> int:
+        """
+        First logical index of the last `seconds` in [lo, hi), counted in
+        frames at the nominal fps - one subtraction instead of a timestamp scan.
+        """
+        return max(lo, hi - seconds * self.fps)
+
+    def _buffered(self, lo: int, hi: int) -> List[BufferedFrame]:
+        """
+        BufferedFrames (copied out of the ring) for logical range [lo, hi).
+        O(hi - lo): metadata comes from two ring slices converted in bulk
+        rather than per-frame scalar reads.
+        """
+        frames = self._frames
+        capacity = self.capacity
+        return [
+            BufferedFrame(frame=frames[n % capacity].copy(), timestamp=ts, frame_number=fn)
+            for n, ts, fn in zip(
+                range(lo, hi),
+                self._ring_slice(self._ts, lo, hi).tolist(),
+                self._ring_slice(self._fn, lo, hi).tolist()
             )
-            self._buffer.append(buffered)
-            self._frame_count += 1
+        ]
 
     def get_frames(self, seconds: Optional[int] = None) -> List[BufferedFrame]:
         """
         Get frames from the buffer.
 
+        Each frame is a copy, so it stays valid after the ring moves on.
+
         Args:
-            seconds: Number of seconds to retrieve (None = all frames)
+            seconds: Number of seconds to retrieve (None = all frames),
+                as seconds * fps of the most recent frames
 
         Returns:
             List of BufferedFrame objects, oldest first
         """
-        with self._lock:
-            if seconds is None:
-                return list(self._buffer)
+        lo, hi = self._window()
 
+        if seconds is not None:
             # Get frames from the last N seconds
-            cutoff_time = time.time() - seconds
-            return [f for f in self._buffer if f.timestamp >= cutoff_time]
+            lo = self._last_seconds(lo, hi, seconds)
 
-    def get_frames_as_array(self, seconds: Optional[int] = None) -> np.ndarray:
+        return self._buffered(lo, hi)
+
+    def get_frames_as_array(self, seconds: Optional[int] = None, copy: bool = False) -> np.ndarray:
         """
         Get frames as a numpy array.
 
+        When the requested range doesn't wrap around the ring this is a
+        zero-copy view of live ring slots, which the producer starts to
+        overwrite about one frame period (plus headroom_seconds) later;
+        otherwise the two halves are joined with one concatenate.
+
         Args:
             seconds: Number of seconds to retrieve
+            copy: Always return an array that owns its data, so it stays
+                valid however far the producer gets ahead
 
         Returns:
             numpy array of shape (N, H, W, C)
         """
-        frames = self.get_frames(seconds)
-        if not frames:
+        lo, hi = self._window()
+
+        if seconds is not None:
+            lo = self._last_seconds(lo, hi, seconds)
+
+        if lo == hi:
+            return np.array([])
+        frames = self._ring_slice(self._frames, lo, hi)
+        if copy and frames.base is self._frames:
+            frames = frames.copy()  # A wrapped range is already a fresh concatenate
+        return frames
+
+    def snapshot(self) -> Tuple[int, int]:
+        """
+        Logical [lo, hi) frame range of the current window, for a later
+        copy_frames(). Taking it is O(1), so a caller can pin the window
+        under its own lock and do the copy elsewhere.
+        """
+        return self._window()
+
+    def copy_frames(self, lo: int, hi: int) -> np.ndarray:
+        """
+        Copy a range taken with snapshot() into an array of its own.
+
+        The producer keeps running during the copy; frames whose slots it may
+        have reached meanwhile (it is within headroom_seconds of them) are
+        dropped from the front of the result rather than returned torn.
+
+        Args:
+            lo: First logical frame index
+            hi: One past the last logical frame index
+
+        Returns:
+            numpy array of shape (N, H, W, C), N <= hi - lo
+        """
+        frames = self._frames
+        lo = max(lo, self._tail)
+        if frames is None or lo >= hi:
             return np.array([])
-        return np.stack([f.frame for f in frames])
+        block = self._ring_slice(frames, lo, hi)
+        if block.base is frames:
+            block = block.copy()  # A wrapped range is already a fresh concatenate
+        # Slot n is reused by frame n + capacity, which may be mid-write
+        # while _head still reads n + capacity
+        first = max(lo, self._head - self.capacity + 1)
+        return block[first - lo:]
 
     def get_recent_frames(self, count: int) -> List[BufferedFrame]:
         """
-        Get the N most recent frames.
+        Get the N most recent frames (copies).
+        Cost is proportional to count, not to the buffer size.
 
         Args:
             count: Number of frames to retrieve
@@ -100,36 +218,31 @@ class VideoBuffer:
         Returns:
             List of BufferedFrame objects
         """
-        with self._lock:
-            if count >= len(self._buffer):
-                return list(self._buffer)
-            return list(self._buffer)[-count:]
+        lo, hi = self._window()
+        return self._buffered(max(lo, hi - count), hi)
 
     def clear(self) -> None:
         """Clear all frames from the buffer."""
-        with self._lock:
-            self._buffer.clear()
-            self._frame_count = 0
+        self._tail = self._head
 
     @property
     def size(self) -> int:
         """Current number of frames in buffer."""
-        with self._lock:
-            return len(self._buffer)
+        lo, hi = self._window()
+        return hi - lo
 
     @property
     def duration(self) -> float:
         """Current duration of buffered video in seconds."""
-        with self._lock:
-            if len(self._buffer) < 2:
-                return 0.0
-            return self._buffer[-1].timestamp - self._buffer[0].timestamp
+        lo, hi = self._window()
+        if hi - lo < 2:
+            return 0.0
+        return float(self._ts[(hi - 1) % self.capacity] - self._ts[lo % self.capacity])
 
     @property
     def is_full(self) -> bool:
         """Check if buffer has reached capacity."""
-        with self._lock:
-            return len(self._buffer) >= self.max_frames
+        return self.size >= self.max_frames
 
     def __len__(self) -> int:
         return self.size
@@ -3,7 +3,12 @@ AI Crime Detection Service - Main Application
 FastAPI server for real-time video analysis and incident detection
 """
 import asyncio
+import logging
+import logging.handlers
+import queue
 import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import asynccontextmanager
 import os
 import tempfile
@@ -11,7 +16,7 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Uplo
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Tuple
 import numpy as np
 
 from .config import settings
@@ -23,6 +28,38 @@ from .core.forensic_report import ForensicReportGenerator
 from .models.violence_detector import ViolenceDetector, DetectionResult
 from .api.websocket import manager as ws_manager
 
+logger = logging.getLogger(__name__)
+
+
+def setup_logging() -> Tuple[logging.handlers.QueueHandler, logging.handlers.QueueListener]:
+    """
+    Route log records through a queue so frame/recording threads only enqueue;
+    a background listener thread does the stdout I/O.
+
+    Returns:
+        The root QueueHandler and the started listener; pass both to
+        teardown_logging() on shutdown
+    """
+    log_queue = queue.Queue(-1)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+
+    root = logging.getLogger()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    root.addHandler(queue_handler)
+    root.setLevel(logging.DEBUG if settings.debug else logging.INFO)
+
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    return queue_handler, listener
+
+
+def teardown_logging(queue_handler: logging.handlers.QueueHandler,
+                     listener: logging.handlers.QueueListener):
+    """Detach the root QueueHandler, then flush and stop its listener."""
+    logging.getLogger().removeHandler(queue_handler)
+    listener.stop()
+
 
 # Global state
 class AppState:
@@ -35,19 +72,49 @@ class AppState:
         self.report_generator = None
         self.is_detecting = False
         self.last_detection = None
-        self.analysis_frames = []
+        # New analysis frames awaiting detection; bounded so a busy detector
+        # only ever leaves the newest batch waiting
+        self.analysis_frames = deque(maxlen=5)
+        # Detection runs serially off the capture thread; at most one batch in flight.
+        # Created per lifespan, since shutdown leaves an executor unusable
+        self.det_executor: Optional[ThreadPoolExecutor] = None
+        self.inflight: Optional[Future] = None
+        self.loop = None  # Server event loop, for scheduling work from worker threads
+        self.upload_queue: Optional[asyncio.Queue] = None  # Drained by upload_worker()
+        self.upload_task: Optional[asyncio.Task] = None
+        self.heartbeat_task: Optional[asyncio.Task] = None
 
 
 state = AppState()
 
 
+def _log_future_error(future):
+    """Log exceptions from fire-and-forget coroutines scheduled on the loop."""
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Background task failed: %s", future.exception())
+
+
+def run_on_loop(coro):
+    """
+    Schedule a coroutine on the server event loop from a worker thread without
+    waiting for it (no per-call event loop, no blocking the calling thread).
+    """
+    if state.loop is None or state.loop.is_closed():
+        coro.close()
+        return None
+    future = asyncio.run_coroutine_threadsafe(coro, state.loop)
+    future.add_done_callback(_log_future_error)
+    return future
+
+
 def on_frame_callback(frame: np.ndarray):
     """Called for every frame - adds to buffer and active recording."""
     if state.buffer is None:
         # Re-initialize buffer if lost (e.g. after module reload)
         from .core.video_buffer import VideoBuffer
-        state.buffer = VideoBuffer(duration_seconds=settings.buffer_duration_seconds, fps=30)
-        print(f"[DEBUG] Buffer re-initialized: {state.buffer.max_frames} max frames")
+        state.buffer = VideoBuffer(duration_seconds=settings.buffer_duration_seconds, fps=30,
+                                   headroom_seconds=1)
+        logger.debug("Buffer re-initialized: %d max frames", state.buffer.max_frames)
     state.buffer.add_frame(frame)
 
     # Add frame to active recording (captures entire event duration)
@@ -58,50 +125,79 @@ def on_frame_callback(frame: np.ndarray):
 def on_analysis_frame_callback(frame: np.ndarray):
     """Called for analysis frames - runs detection."""
     if not state.is_detecting or state.detector is None:
+        # Detection stopped mid-batch - don't hold on to partial frames
+        if state.analysis_frames:
+            state.analysis_frames.clear()
         return
 
-    # Collect frames for temporal analysis
+    # Collect new frames for temporal analysis; the detector keeps the
+    # grayscale of the previous batch's overlap itself
     state.analysis_frames.append(frame)
 
     # Analyze every 5 frames (1 second at 5 fps) for faster response
-    if len(state.analysis_frames) >= 5:
-        frames_array = np.array(state.analysis_frames)
-        state.analysis_frames = state.analysis_frames[-2:]  # Keep small overlap
-
-        # Run detection
-        result = state.detector.detect(frames_array)
-        state.last_detection = result
-
-        if result.is_violent:
-            print(f"DETECTION: {result.description} (confidence: {result.confidence:.2f})")
-
-            # Send WebSocket alert
-            asyncio.run(ws_manager.send_detection_alert(
-                detection_type="violence",
-                confidence=result.confidence,
-                camera_id=settings.camera_id,
-                description=result.description
-            ))
-
-            # Start or continue event recording
-            if state.recorder:
-                if not state.recorder.is_recording:
-                    # First detection - start new event
-                    state.recorder.start_event(
-                        detection_type="violence",
-                        confidence=result.confidence
-                    )
-                else:
-                    # Event ongoing - extend recording
-                    state.recorder.continue_event(confidence=result.confidence)
+    if state.detector.pending_frames + len(state.analysis_frames) >= 5:
+        if state.inflight is not None and not state.inflight.done():
+            # Detector still busy - the deque keeps only the newest frames;
+            # try again on the next frame instead of blocking capture
+            return
+
+        frames = list(state.analysis_frames)
+        state.analysis_frames.clear()
+
+        # Run detection in the background
+        state.inflight = state.det_executor.submit(_detect_frames, frames)
+        state.inflight.add_done_callback(_on_detection_done)
+
+
+def _detect_frames(frames) -> DetectionResult:
+    """Feed new analysis frames to the detector and score the batch (detector thread)."""
+    for frame in frames:
+        state.detector.feed(frame)
+    return state.detector.finalize()
+
+
+def _on_detection_done(future: Future):
+    """Handle a finished detection batch (runs on the detector thread)."""
+    if future.cancelled():
+        return
+    if future.exception() is not None:
+        logger.error("Detection error: %s", future.exception())
+        return
+
+    result: DetectionResult = future.result()
+    state.last_detection = result
+
+    # A batch that finishes after detection was stopped is not acted on
+    if result.is_violent and state.is_detecting:
+        logger.info("DETECTION: %s (confidence: %.2f)", result.description, result.confidence)
+
+        # Send WebSocket alert
+        run_on_loop(ws_manager.send_detection_alert(
+            detection_type="violence",
+            confidence=result.confidence,
+            camera_id=settings.camera_id,
+            description=result.description
+        ))
+
+        # Start or continue event recording
+        if state.recorder:
+            if not state.recorder.is_recording:
+                # First detection - start new event
+                state.recorder.start_event(
+                    detection_type="violence",
+                    confidence=result.confidence
+                )
+            else:
+                # Event ongoing - extend recording
+                state.recorder.continue_event(confidence=result.confidence)
 
 
 def on_recording_complete(recording: IncidentRecording):
     """Called when a recording is saved."""
-    print(f"Recording complete: {recording.filepath}")
+    logger.info("Recording complete: %s", recording.filepath)
 
     # Send WebSocket alert
-    asyncio.run(ws_manager.send_recording_alert(
+    run_on_loop(ws_manager.send_recording_alert(
         status="completed",
         camera_id=recording.camera_id,
         video_hash=recording.video_hash,
@@ -127,68 +223,110 @@ def on_recording_complete(recording: IncidentRecording):
             state.report_generator.save_report(report, reports_dir)
             recording.report_hash = report.report_hash
             recording.ai_model_version = report.ai_model_version
-            print(f"Forensic report generated: hash={report.report_hash}")
+            logger.info("Forensic report generated: hash=%s", report.report_hash)
         except Exception as e:
-            print(f"Forensic report generation failed: {e}")
+            logger.error("Forensic report generation failed: %s", e)
 
-    # Upload to backend for blockchain storage
-    if state.uploader:
-        result = state.uploader.upload_recording_sync(recording)
+    # Queue for upload to backend (blockchain storage); this thread returns now
+    if state.uploader and state.loop is not None and not state.loop.is_closed():
+        state.loop.call_soon_threadsafe(enqueue_upload, recording)
+
+
+def enqueue_upload(recording: IncidentRecording):
+    """Queue a recording for upload (runs on the server loop)."""
+    try:
+        state.upload_queue.put_nowait(recording)
+    except asyncio.QueueFull:
+        # Backend is down or far behind - the file stays on disk
+        logger.warning("Upload queue full, skipping upload of %s", recording.filepath)
+
+
+async def upload_worker():
+    """Upload queued recordings one at a time over the uploader's shared client."""
+    while True:
+        recording = await state.upload_queue.get()
+        try:
+            await upload_recording(recording)
+        except Exception as e:
+            logger.error("Upload error: %s", e)
+        finally:
+            state.upload_queue.task_done()
+
+
+async def upload_recording(recording: IncidentRecording):
+    """Upload a recording for blockchain storage, then send alerts."""
+    result = await state.uploader.upload_recording(recording)
+
+    if result.success:
+        logger.info("Uploaded to blockchain: TX %s", result.transaction_hash)
+        await ws_manager.send_recording_alert(
+            status="blockchain_confirmed",
+            camera_id=recording.camera_id,
+            video_hash=result.video_hash,
+            transaction_hash=result.transaction_hash
+        )
 
-        if result.success:
-            print(f"Uploaded to blockchain: TX {result.transaction_hash}")
-            asyncio.run(ws_manager.send_recording_alert(
-                status="blockchain_confirmed",
+        # Send email alert if configured (blocking SMTP, so off the loop)
+        recipients = [r.strip() for r in settings.alert_email_recipients.split(",") if r.strip()]
+        if recipients:
+            from .utils.email_alert import send_incident_email
+            await asyncio.to_thread(
+                send_incident_email,
+                smtp_host=settings.alert_smtp_host,
+                smtp_port=settings.alert_smtp_port,
+                sender=settings.alert_email_sender,
+                password=settings.alert_email_password,
+                recipients=recipients,
                 camera_id=recording.camera_id,
+                event_type=recording.event_type or recording.detection_type,
+                confidence=recording.confidence,
                 video_hash=result.video_hash,
-                transaction_hash=result.transaction_hash
-            ))
-
-            # Send email alert if configured
-            recipients = [r.strip() for r in settings.alert_email_recipients.split(",") if r.strip()]
-            if recipients:
-                from .utils.email_alert import send_incident_email
-                send_incident_email(
-                    smtp_host=settings.alert_smtp_host,
-                    smtp_port=settings.alert_smtp_port,
-                    sender=settings.alert_email_sender,
-                    password=settings.alert_email_password,
-                    recipients=recipients,
-                    camera_id=recording.camera_id,
-                    event_type=recording.event_type or recording.detection_type,
-                    confidence=recording.confidence,
-                    video_hash=result.video_hash,
-                    transaction_hash=result.transaction_hash,
-                    timestamp=recording.timestamp,
-                )
-        else:
-            print(f"Upload failed: {result.error}")
-            asyncio.run(ws_manager.send_recording_alert(
-                status="upload_failed",
-                camera_id=recording.camera_id,
-                video_hash=recording.video_hash
-            ))
+                transaction_hash=result.transaction_hash,
+                timestamp=recording.timestamp,
+            )
+    else:
+        logger.error("Upload failed: %s", result.error)
+        await ws_manager.send_recording_alert(
+            status="upload_failed",
+            camera_id=recording.camera_id,
+            video_hash=recording.video_hash
+        )
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan - startup and shutdown."""
     # Startup
-    print("Starting AI Crime Detection Service...")
+    log_handler, log_listener = setup_logging()
+    logger.info("Starting AI Crime Detection Service...")
+    state.loop = asyncio.get_running_loop()
+    state.det_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="detect")
+    state.inflight = None
+    state.analysis_frames.clear()
+    state.upload_queue = asyncio.Queue(maxsize=settings.upload_queue_size)
+    state.upload_task = asyncio.create_task(upload_worker())
+    state.heartbeat_task = asyncio.create_task(
+        ws_manager.heartbeat_loop(settings.ws_heartbeat_interval)
+    )
 
     # Initialize components
     state.buffer = VideoBuffer(
         duration_seconds=settings.buffer_duration_seconds,
-        fps=30
+        fps=30,
+        headroom_seconds=1  # Time the recorder has to copy out the pre-event window
     )
-    print(f"Buffer initialized: {state.buffer}, max_frames={state.buffer.max_frames}")
+    logger.info("Buffer initialized: %s, max_frames=%d", state.buffer, state.buffer.max_frames)
 
     state.detector = ViolenceDetector(
         threshold=settings.detection_threshold,
         device=settings.model_device,
         use_deep_learning=True,
-        model_path=settings.yolo_model
+        model_path=settings.yolo_model,
+        analysis_max_dim=settings.analysis_max_dim,
+        green_channel=settings.motion_green_channel,
+        use_numba=settings.motion_use_numba
     )
+    state.detector.warmup()
 
     state.recorder = RecordingManager(
         buffer=state.buffer,
@@ -207,9 +345,9 @@ async def lifespan(app: FastAPI):
         model_name=settings.gemini_model
     )
     if state.report_generator.is_available:
-        print(f"Forensic report generator ready (model: {state.report_generator.model_name})")
+        logger.info("Forensic report generator ready (model: %s)", state.report_generator.model_name)
     else:
-        print("Forensic report generator: Gemini unavailable, using fallback reports")
+        logger.warning("Forensic report generator: Gemini unavailable, using fallback reports")
 
     state.processor = StreamProcessor(
         source=settings.video_source,
@@ -219,14 +357,22 @@ async def lifespan(app: FastAPI):
         on_analysis_frame=on_analysis_frame_callback
     )
 
-    print(f"Components initialized. Camera: {settings.camera_id}")
+    logger.info("Components initialized. Camera: %s", settings.camera_id)
 
     yield
 
     # Shutdown
-    print("Shutting down AI Crime Detection Service...")
+    logger.info("Shutting down AI Crime Detection Service...")
     if state.processor:
         state.processor.stop()
+    state.det_executor.shutdown(wait=False, cancel_futures=True)
+    if state.recorder:
+        state.recorder.shutdown()
+    state.upload_task.cancel()
+    state.heartbeat_task.cancel()
+    if state.uploader:
+        await state.uploader.aclose()
+    teardown_logging(log_handler, log_listener)
 
 
 # Create FastAPI app
@@ -316,7 +462,8 @@ async def start_detection(request: StartDetectionRequest = None):
             raise HTTPException(status_code=500, detail="Failed to start video stream")
 
     state.is_detecting = True
-    state.analysis_frames = []
+    state.analysis_frames.clear()
+    state.detector.drop_pending()  # Don't pair new frames with pre-stop overlap
 
     return {"status": "started", "camera_id": settings.camera_id}
 
@@ -325,6 +472,7 @@ async def start_detection(request: StartDetectionRequest = None):
 async def stop_detection():
     """Stop detection (keeps stream running). Clears buffer."""
     state.is_detecting = False
+    state.analysis_frames.clear()
     if state.buffer:
         state.buffer.clear()
     return {"status": "stopped"}
@@ -334,6 +482,7 @@ async def stop_detection():
 async def stop_stream():
     """Stop video stream completely. Clears buffer."""
     state.is_detecting = False
+    state.analysis_frames.clear()
     if state.processor:
         state.processor.stop()
     if state.buffer:
@@ -457,22 +606,15 @@ async def websocket_endpoint(websocket: WebSocket):
             buffer_size=state.buffer.size if state.buffer else 0
         )
 
-        # Keep connection alive
+        # Keep connection alive; heartbeats come from the shared
+        # heartbeat_loop task started in lifespan()
         while True:
-            try:
-                # Wait for messages (ping/pong)
-                data = await asyncio.wait_for(
-                    websocket.receive_text(),
-                    timeout=settings.ws_heartbeat_interval
-                )
-
-                # Handle ping
-                if data == "ping":
-                    await websocket.send_text("pong")
+            # Wait for messages (ping/pong)
+            data = await websocket.receive_text()
 
-            except asyncio.TimeoutError:
-                # Send heartbeat
-                await websocket.send_text("heartbeat")
+            # Handle ping
+            if data == "ping":
+                await websocket.send_text("pong")
 
     except WebSocketDisconnect:
         await ws_manager.disconnect(websocket)
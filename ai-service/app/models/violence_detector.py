@@ -4,10 +4,40 @@ Uses motion analysis and deep learning for detecting violent activities
 """
 import numpy as np
 import cv2
-from typing import Tuple, List, Optional
+from typing import Tuple, Optional
 from dataclasses import dataclass
+import logging
 import threading
 
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+logger = logging.getLogger(__name__)
+
+
+if HAS_NUMBA:
+    @njit(nogil=True, fastmath=True, cache=True)
+    def _motion_kernel(prev_gray, curr_gray, thr):
+        """
+        Fused absdiff/threshold/reduce over one frame pair: a single pass over
+        the pixels returning (pixels above thr, sum of their differences).
+        Serial and GIL-free: no numba threading layer is started, and the
+        detection thread doesn't hold up the event loop while it runs.
+        """
+        h, w = prev_gray.shape
+        count = 0
+        total = 0
+        for i in range(h):
+            for j in range(w):
+                d = abs(np.int32(prev_gray[i, j]) - np.int32(curr_gray[i, j]))
+                if d > thr:
+                    count += 1
+                    total += d
+        return count, total
+
 
 @dataclass
 class DetectionResult:
@@ -31,7 +61,10 @@ class ViolenceDetector:
         threshold: float = 0.6,
         device: str = "cpu",
         use_deep_learning: bool = False,
-        model_path: str = "yolov8n.pt"
+        model_path: str = "yolov8n.pt",
+        analysis_max_dim: int = 320,
+        green_channel: bool = False,
+        use_numba: bool = False
     ):
         """
         Initialize the violence detector.
@@ -41,6 +74,13 @@ class ViolenceDetector:
             device: 'cpu' or 'cuda'
             use_deep_learning: Whether to use YOLOv8-based detection
             model_path: YOLO model weights file (auto-downloaded if not present)
+            analysis_max_dim: Longest side frames are downsampled to before
+                motion analysis (0 = full resolution)
+            green_channel: Measure motion on the green channel instead of
+                luminance (skips the weighted BGR sum)
+            use_numba: Use the fused Numba motion kernel when Numba is
+                installed. Off by default: at the default analysis size the
+                OpenCV path is faster; the kernel pays off at larger sizes
         """
         self.threshold = threshold
         self.device = device
@@ -48,19 +88,37 @@ class ViolenceDetector:
         self.model_path = model_path
         self._lock = threading.Lock()
 
-        # Motion detection parameters
+        # Motion detection parameters. Area is a fraction of the frame and the
+        # difference threshold is per pixel, so both carry over to the
+        # downsampled analysis resolution unchanged
         self.motion_threshold = 50  # Pixel difference threshold
         self.motion_area_threshold = 0.1  # 10% of frame must have motion
+        self.min_motion_area = 0.01  # Pairs with less moving area score 0 outright
+        self.analysis_max_dim = analysis_max_dim
+        self.green_channel = green_channel
+        self.use_numba = use_numba and HAS_NUMBA
         self.rapid_motion_multiplier = 2.0  # Multiplier for sudden motion
 
         # Frame history for motion analysis
         self._prev_frame: Optional[np.ndarray] = None
-        self._motion_history: List[float] = []
         self._history_size = 30  # Keep last 30 motion scores
+        self._recent_size = 5  # Most recent scores compared against the rest
+        self._reset_history()
+
+        # Scratch buffers reused across detect() calls (allocated on first frame)
+        self._gray: Optional[np.ndarray] = None  # (N+1, H, W) grayscale rows, see _ensure_scratch
+        self._diff: Optional[np.ndarray] = None  # (N*H, W) pair differences
+        self._thresh: Optional[np.ndarray] = None  # (N*H, W) differences above threshold
+        self._small: Optional[np.ndarray] = None  # (N, h, w, C) downsampled batch
+
+        # feed()/finalize() state: fed grayscale frames live in _gray[1:_fed + 1]
+        self._fed = 0
+        self._overlap = 2  # Frames carried into the next batch
+        self._last_frame: Optional[np.ndarray] = None
 
         # Deep learning model (optional)
         self._model = None
-        self._transform = None
+        self._half = device.startswith("cuda")  # FP16 inference on GPU
 
         if use_deep_learning:
             self._init_deep_model()
@@ -70,9 +128,13 @@ class ViolenceDetector:
         try:
             from ultralytics import YOLO
             self._model = YOLO(self.model_path)  # auto-downloads yolov8n.pt
-            print(f"YOLOv8 model loaded: {self.model_path}")
+            if self._half:
+                # Input size is fixed, so let cuDNN pick its fastest kernels once
+                import torch
+                torch.backends.cudnn.benchmark = True
+            logger.info("YOLOv8 model loaded: %s", self.model_path)
         except Exception as e:
-            print(f"Could not load YOLO model: {e}")
+            logger.warning("Could not load YOLO model: %s", e)
             self.use_deep_learning = False
 
     def detect(self, frames: np.ndarray) -> DetectionResult:
@@ -100,37 +162,108 @@ class ViolenceDetector:
 
             # Analyze motion across frames
             motion_score = self._analyze_motion(frames)
+            self._fed = 0  # Batch rows overwrote any fed frames
+            return self._build_result(motion_score, frames[-1])
 
-            # Optional: deep learning analysis
-            dl_score = 0.0
-            if self.use_deep_learning and self._model is not None:
-                dl_score = self._deep_learning_detect(frames[-1])
+    def feed(self, frame: np.ndarray):
+        """
+        Streaming form of detect(): downsample and convert one new frame to
+        grayscale and hold it until finalize(). Each frame is converted
+        exactly once, including the ones kept as overlap for the next batch.
 
-            # Combine scores
-            if self.use_deep_learning:
-                confidence = 0.4 * motion_score + 0.6 * dl_score
-            else:
-                confidence = motion_score
-
-            is_violent = confidence >= self.threshold
-
-            # Generate description
-            if is_violent:
-                if motion_score > 0.8:
-                    description = "High-intensity motion detected - possible violent altercation"
-                elif motion_score > 0.6:
-                    description = "Aggressive motion pattern detected"
-                else:
-                    description = "Suspicious activity detected"
+        Args:
+            frame: BGR frame of shape (H, W, C)
+        """
+        with self._lock:
+            small = self._downsample(frame[np.newaxis])
+            h, w = small.shape[1:3]
+            gray = self._gray
+            self._ensure_scratch(5, h, w)
+            if self._gray is not gray:
+                self._fed = 0  # New resolution - older frames can't be paired
+
+            rows = len(self._gray) - 1
+            if self._fed == rows:
+                # Full - drop the oldest fed frame
+                self._gray[1:rows] = self._gray[2:rows + 1]
+                self._fed -= 1
+            self._fed += 1
+            self._to_gray(small, self._gray[self._fed:self._fed + 1], self.green_channel)
+            self._last_frame = frame
+
+    def finalize(self) -> DetectionResult:
+        """
+        Score the frames fed since the last finalize() (plus the retained
+        overlap), then keep the newest frames as overlap for the next batch.
+
+        Returns:
+            DetectionResult with detection status and confidence
+        """
+        with self._lock:
+            n = self._fed
+            if n == 0:
+                return DetectionResult(
+                    is_violent=False,
+                    confidence=0.0,
+                    motion_score=0.0,
+                    description="No frames to analyze"
+                )
+
+            gray = self._gray[1:n + 1]
+            motion_score = self._score_motion(gray) if n >= 2 else 0.0
+
+            keep = min(self._overlap, n)
+            self._gray[1:keep + 1] = gray[n - keep:]
+            self._fed = keep
+
+            # Last frame also backs single-frame detect() pairing
+            self._store_prev(keep)
+
+            return self._build_result(motion_score, self._last_frame)
+
+    def drop_pending(self):
+        """Discard frames held by feed(), keeping the motion history."""
+        with self._lock:
+            self._fed = 0
+            self._last_frame = None
+
+    @property
+    def pending_frames(self) -> int:
+        """Frames held by feed() (including overlap) that the next finalize() scores."""
+        return self._fed
+
+    def _build_result(self, motion_score: float, last_frame: np.ndarray) -> DetectionResult:
+        """Combine the motion score with the optional model score on the last frame."""
+        # Optional: deep learning analysis
+        dl_score = 0.0
+        if self.use_deep_learning and self._model is not None:
+            dl_score = self._deep_learning_detect(last_frame)
+
+        # Combine scores
+        if self.use_deep_learning:
+            confidence = 0.4 * motion_score + 0.6 * dl_score
+        else:
+            confidence = motion_score
+
+        is_violent = confidence >= self.threshold
+
+        # Generate description
+        if is_violent:
+            if motion_score > 0.8:
+                description = "High-intensity motion detected - possible violent altercation"
+            elif motion_score > 0.6:
+                description = "Aggressive motion pattern detected"
             else:
-                description = "Normal activity"
+                description = "Suspicious activity detected"
+        else:
+            description = "Normal activity"
 
-            return DetectionResult(
-                is_violent=is_violent,
-                confidence=float(confidence),
-                motion_score=float(motion_score),
-                description=description
-            )
+        return DetectionResult(
+            is_violent=is_violent,
+            confidence=float(confidence),
+            motion_score=float(motion_score),
+            description=description
+        )
 
     def _analyze_motion(self, frames: np.ndarray) -> float:
         """
@@ -143,57 +276,58 @@ class ViolenceDetector:
         Returns:
             Motion score (0-1)
         """
-        if len(frames) < 2:
+        frames = self._downsample(frames)
+        n, h, w = frames.shape[:3]
+        self._ensure_scratch(n, h, w)
+        self._to_gray(frames, self._gray[1:n + 1], self.green_channel)
+
+        if n < 2:
             if self._prev_frame is None:
-                self._prev_frame = cv2.cvtColor(frames[0], cv2.COLOR_BGR2GRAY)
+                self._store_prev(1)
                 return 0.0
-            frames = np.array([self._prev_frame, frames[0]])
-
-        motion_scores = []
-
-        for i in range(1, len(frames)):
-            # Convert to grayscale
-            if len(frames[i-1].shape) == 3:
-                prev_gray = cv2.cvtColor(frames[i-1], cv2.COLOR_BGR2GRAY)
-            else:
-                prev_gray = frames[i-1]
+            # Pair the single frame with the previous call's last frame,
+            # which already sits in the row in front of it
+            score = self._score_motion(self._gray[:2])
+        else:
+            score = self._score_motion(self._gray[1:n + 1])
 
-            if len(frames[i].shape) == 3:
-                curr_gray = cv2.cvtColor(frames[i], cv2.COLOR_BGR2GRAY)
-            else:
-                curr_gray = frames[i]
-
-            # Calculate frame difference
-            diff = cv2.absdiff(prev_gray, curr_gray)
+        # Keep the last frame's grayscale for the next call
+        self._store_prev(n)
+        return score
 
-            # Apply threshold
-            _, thresh = cv2.threshold(diff, self.motion_threshold, 255, cv2.THRESH_BINARY)
-
-            # Calculate motion area percentage
-            motion_area = np.sum(thresh > 0) / thresh.size
+    def _score_motion(self, gray: np.ndarray) -> float:
+        """
+        Score motion across consecutive grayscale frames and fold it into the
+        spike history.
 
-            # Calculate motion intensity (mean of differences in motion areas)
-            motion_intensity = np.mean(diff[thresh > 0]) / 255 if np.any(thresh > 0) else 0
+        Args:
+            gray: (N, H, W) grayscale frames, N >= 2
 
-            # Combined motion score
-            frame_motion = min(1.0, motion_area * 5) * motion_intensity
-            motion_scores.append(frame_motion)
+        Returns:
+            Motion score (0-1)
+        """
+        # Per-pair motion area and mean difference within the motion area
+        n, h, w = gray.shape
+        counts, sums = self._pair_stats(gray)
+        motion_area = counts / (h * w)
+        motion_intensity = np.divide(sums, counts * 255.0, out=np.zeros(n - 1), where=counts > 0)
 
-        # Store last frame for next call
-        self._prev_frame = frames[-1] if len(frames[-1].shape) == 2 else cv2.cvtColor(frames[-1], cv2.COLOR_BGR2GRAY)
+        # Combined motion score per pair
+        motion_scores = np.minimum(1.0, motion_area * 5) * motion_intensity
+        motion_scores[motion_area < self.min_motion_area] = 0.0
 
         # Calculate current motion
-        current_motion = np.mean(motion_scores) if motion_scores else 0.0
+        current_motion = float(motion_scores.mean())
 
         # Update history
-        self._motion_history.append(current_motion)
-        if len(self._motion_history) > self._history_size:
-            self._motion_history.pop(0)
+        self._push_history(current_motion)
 
         # Detect sudden motion spikes (characteristic of violence)
-        if len(self._motion_history) >= 5:
-            recent_avg = np.mean(self._motion_history[-5:])
-            baseline_avg = np.mean(self._motion_history[:-5]) if len(self._motion_history) > 5 else 0.1
+        hist_len = self._hist_len
+        if hist_len >= self._recent_size:
+            recent_avg = self._recent_sum / self._recent_size
+            baseline_len = hist_len - self._recent_size
+            baseline_avg = self._baseline_sum / baseline_len if baseline_len else 0.1
 
             # Spike detection
             if baseline_avg > 0 and recent_avg > baseline_avg * self.rapid_motion_multiplier:
@@ -201,39 +335,200 @@ class ViolenceDetector:
 
         return min(1.0, current_motion)
 
+    def _downsample(self, frames: np.ndarray) -> np.ndarray:
+        """
+        Shrink a batch so its longest side is at most analysis_max_dim.
+        Motion analysis is memory-bound, so this cuts its cost roughly in
+        proportion to the pixel count. Returns a view of a reused buffer.
+
+        INTER_LINEAR rather than INTER_AREA: area averaging reads every
+        source pixel and costs more than the full-resolution analysis it
+        replaces, while motion blobs are far larger than the sampling step.
+        """
+        n, h, w = frames.shape[:3]
+        max_dim = self.analysis_max_dim
+        if not max_dim or max(h, w) <= max_dim:
+            return frames
+
+        scale = max_dim / max(h, w)
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))  # cv2 takes (width, height)
+        shape = (size[1], size[0]) + frames.shape[3:]
+        small = self._small
+        if small is None or small.shape[1:] != shape or len(small) < n or small.dtype != frames.dtype:
+            small = self._small = np.empty((max(n, 5),) + shape, dtype=frames.dtype)
+
+        for i in range(n):
+            cv2.resize(frames[i], size, dst=small[i], interpolation=cv2.INTER_LINEAR)
+        return small[:n]
+
+    def _ensure_scratch(self, n: int, h: int, w: int):
+        """
+        Allocate the grayscale/difference scratch buffers for a batch of n
+        (h, w) frames, reusing them while the resolution stays the same.
+
+        _gray is laid out as [previous frame, n batch rows], so a single new
+        frame pairs with the previous one without copying; smaller batches
+        use a prefix of the rows. feed() keeps its frames in the batch rows too.
+        """
+        if (self._gray is not None and self._gray.shape[1:] == (h, w)
+                and len(self._gray) >= n + 1):
+            return
+        prev = self._prev_frame
+        if prev is not None and prev.shape != (h, w):
+            prev = None  # Resolution changed - no previous frame to pair with
+
+        rows = max(n, 5)  # Typical batch is 5 frames
+        self._gray = np.empty((rows + 1, h, w), dtype=np.uint8)
+        self._diff = np.empty((rows * h, w), dtype=np.uint8)
+        self._thresh = np.empty((rows * h, w), dtype=np.uint8)
+
+        self._prev_frame = None
+        if prev is not None:
+            np.copyto(self._gray[0], prev)
+            self._prev_frame = self._gray[0]
+
+    def _store_prev(self, row: int):
+        """Keep the grayscale frame in batch row `row` as the previous frame."""
+        np.copyto(self._gray[0], self._gray[row])
+        self._prev_frame = self._gray[0]
+
+    def _reset_history(self):
+        """Empty the motion score ring and its running sums."""
+        self._hist = np.zeros(self._history_size, dtype=np.float64)
+        self._hist_idx = 0  # Next slot to write
+        self._hist_len = 0
+        self._recent_sum = 0.0  # Sum of the last _recent_size scores
+        self._baseline_sum = 0.0  # Sum of the older scores
+
+    def _push_history(self, score: float):
+        """
+        Append a motion score, keeping the recent/baseline sums up to date in
+        O(1) instead of re-averaging the whole history.
+        """
+        hist, idx = self._hist, self._hist_idx
+        if self._hist_len == self._history_size:
+            # Oldest score drops out of the baseline
+            self._baseline_sum -= hist[idx]
+        if self._hist_len >= self._recent_size:
+            # Score that is now 6th-most-recent moves from recent to baseline
+            moved = hist[(idx - self._recent_size) % self._history_size]
+            self._recent_sum -= moved
+            self._baseline_sum += moved
+        # Avoid float residue keeping an all-zero baseline "positive"
+        if self._baseline_sum < 1e-12:
+            self._baseline_sum = 0.0
+
+        hist[idx] = score
+        self._recent_sum += score
+        self._hist_idx = (idx + 1) % self._history_size
+        self._hist_len = min(self._hist_len + 1, self._history_size)
+
+    def _pair_stats(self, gray: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        For each consecutive grayscale pair, count pixels whose difference
+        exceeds motion_threshold and sum those differences.
+        """
+        n, h, w = gray.shape
+
+        if self.use_numba:
+            counts = np.empty(n - 1, dtype=np.int64)
+            sums = np.empty(n - 1, dtype=np.int64)
+            for i in range(n - 1):
+                counts[i], sums[i] = _motion_kernel(gray[i], gray[i + 1], self.motion_threshold)
+            return counts, sums
+
+        # Difference every consecutive pair in one call; OpenCV treats a 3-D
+        # array's last axis as channels, so work on (N*H, W) views. Outputs
+        # go into the preallocated scratch buffers
+        rows = (n - 1) * h
+        diff = cv2.absdiff(
+            gray[:-1].reshape(rows, w),
+            gray[1:].reshape(rows, w),
+            dst=self._diff[:rows]
+        )
+        # Zero everything at or below the threshold; what remains is the
+        # motion area and its differences
+        _, moving = cv2.threshold(
+            diff, self.motion_threshold, 0, cv2.THRESH_TOZERO, dst=self._thresh[:rows]
+        )
+        counts = np.zeros(n - 1, dtype=np.int64)
+        sums = np.zeros(n - 1, dtype=np.int64)
+        min_count = self.min_motion_area * h * w
+        for i in range(n - 1):
+            pair = moving[i * h:(i + 1) * h]
+            counts[i] = cv2.countNonZero(pair)
+            # Near-static pair scores 0 anyway - skip the intensity reduction
+            if counts[i] >= min_count:
+                sums[i] = int(cv2.sumElems(pair)[0])
+        return counts, sums
+
+    def warmup(self):
+        """Compile the motion kernel ahead of time so the first detection doesn't pay for it."""
+        if self.use_numba:
+            dummy = np.zeros((8, 8), dtype=np.uint8)
+            _motion_kernel(dummy, dummy, self.motion_threshold)
+
+    @staticmethod
+    def _to_gray(frames: np.ndarray, out: np.ndarray, green: bool = False):
+        """
+        Convert an (N, H, W, C) BGR batch into the (N, H, W) `out` with one
+        OpenCV call: luminance via cvtColor, or a plain copy of the green
+        channel (which carries most of the luminance) when `green` is set.
+        """
+        if frames.ndim == 3:
+            np.copyto(out, frames)  # Already grayscale
+            return
+        n, h, w, c = frames.shape
+        stacked = np.ascontiguousarray(frames).reshape(n * h, w, c)
+        if green:
+            cv2.extractChannel(stacked, 1, dst=out.reshape(n * h, w))
+        else:
+            cv2.cvtColor(stacked, cv2.COLOR_BGR2GRAY, dst=out.reshape(n * h, w))
+
     def _deep_learning_detect(self, frame: np.ndarray) -> float:
         """Use YOLOv8 to detect persons/suspicious activity."""
         if self._model is None:
             return 0.0
         try:
-            results = self._model(frame, verbose=False, device=self.device)[0]
-            # Extract person detections (COCO class 0 = person)
-            person_boxes = [b for b in results.boxes if int(b.cls) == 0 and float(b.conf) > 0.4]
-            num_persons = len(person_boxes)
+            # Let the predictor drop non-person and low-confidence boxes
+            # (COCO class 0 = person) so results come back as a few tensors
+            # read once, not per-box tensor accesses
+            results = self._model(
+                frame, verbose=False, device=self.device,
+                half=self._half, classes=[0], conf=0.4
+            )[0]
+            boxes = results.boxes
+            num_persons = len(boxes)
             if num_persons == 0:
                 return 0.0
-            avg_conf = sum(float(b.conf) for b in person_boxes) / num_persons
+            conf = boxes.conf.cpu().numpy()
+            centers = boxes.xywh[:, :2].cpu().numpy()
+            avg_conf = float(conf.mean())
             crowd_score = min(1.0, num_persons / 4)  # 4+ persons = max crowd score
-            proximity_score = self._calc_proximity(person_boxes)
+            proximity_score = self._calc_proximity(centers)
             return min(1.0, avg_conf * 0.4 + crowd_score * 0.3 + proximity_score * 0.3)
         except Exception as e:
-            print(f"YOLO detection error: {e}")
+            logger.error("YOLO detection error: %s", e)
             return 0.0
 
-    def _calc_proximity(self, boxes) -> float:
+    @staticmethod
+    def _calc_proximity(centers: np.ndarray) -> float:
         """Score how close detected persons are to each other (0-1)."""
-        if len(boxes) < 2:
+        if len(centers) < 2:
             return 0.0
-        centers = [(float(b.xywh[0][0]), float(b.xywh[0][1])) for b in boxes]
-        min_dist = float('inf')
-        for i in range(len(centers)):
-            for j in range(i + 1, len(centers)):
-                d = ((centers[i][0] - centers[j][0])**2 + (centers[i][1] - centers[j][1])**2)**0.5
-                min_dist = min(min_dist, d)
+        dists = np.linalg.norm(centers[:, None, :] - centers[None, :, :], axis=-1)
+        np.fill_diagonal(dists, np.inf)
+        min_dist = float(dists.min())
         return max(0.0, 1.0 - min_dist / 300)  # <300px apart = high proximity
 
     def reset(self):
         """Reset the detector state."""
         with self._lock:
             self._prev_frame = None
-            self._motion_history.clear()
+            self._gray = None
+            self._diff = None
+            self._thresh = None
+            self._small = None
+            self._fed = 0
+            self._last_frame = None
+            self._reset_history()
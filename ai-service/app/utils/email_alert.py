@@ -3,12 +3,15 @@ Email alert sender for incident notifications.
 Uses Python built-in smtplib — no extra dependency required.
 Configure via ai-service/.env (ALERT_EMAIL_* variables).
 """
+import logging
 import smtplib
 import ssl
 from datetime import datetime
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
+logger = logging.getLogger(__name__)
+
 
 def send_incident_email(
     smtp_host: str,
@@ -28,7 +31,7 @@ def send_incident_email(
     Returns True on success, False on any failure (never raises).
     """
     if not smtp_host or not sender or not password or not recipients:
-        print("Email alert skipped — SMTP not configured in .env")
+        logger.info("Email alert skipped — SMTP not configured in .env")
         return False
 
     try:
@@ -67,9 +70,9 @@ Use the Verifier page to confirm authenticity at any time.
             server.login(sender, password)
             server.sendmail(sender, recipients, msg.as_string())
 
-        print(f"Incident email sent to {recipients}")
+        logger.info("Incident email sent to %s", recipients)
         return True
 
     except Exception as e:
-        print(f"Failed to send incident email: {e}")
+        logger.error("Failed to send incident email: %s", e)
         return False
@@ -10,11 +10,14 @@ Novel algorithm combining:
 
 No prior algorithm combines all five properties simultaneously.
 """
+import logging
 import numpy as np
 import cv2
 import hashlib
 from typing import List
 
+logger = logging.getLogger(__name__)
+
 
 BLOCK_SIZE = 8      # 8×8 pixels per block
 GRID_SIZE = 4       # 4×4 grid of blocks = 16 blocks total
@@ -197,7 +200,7 @@ def compute_video_k2a_hash(video_path: str) -> str:
         return compute_k2a_temporal(frames)
 
     except Exception as e:
-        print(f"K2A hash error: {e}")
+        logger.error("K2A hash error: %s", e)
         return _fallback_hash(video_path)
 
 
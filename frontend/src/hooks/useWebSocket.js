@@ -1,5 +1,7 @@
 import { useState, useEffect, useCallback, useRef } from 'react';
 
+const textDecoder = new TextDecoder();
+
 /**
  * Custom hook for WebSocket connection to AI service
  */
@@ -20,6 +22,7 @@ export function useWebSocket(url = 'ws://localhost:8000/ws/alerts') {
 
     try {
       wsRef.current = new WebSocket(url);
+      wsRef.current.binaryType = 'arraybuffer';
 
       wsRef.current.onopen = () => {
         console.log('WebSocket connected');
@@ -46,10 +49,13 @@ export function useWebSocket(url = 'ws://localhost:8000/ws/alerts') {
       };
 
       wsRef.current.onmessage = (event) => {
-        const data = event.data;
+        // Alerts arrive as binary JSON frames; pong is text
+        const data = typeof event.data === 'string'
+          ? event.data
+          : textDecoder.decode(event.data);
 
-        // Handle heartbeat/pong
-        if (data === 'heartbeat' || data === 'pong') {
+        // Handle heartbeat (single 0x01 byte) / pong
+        if (data === '\u0001' || data === 'heartbeat' || data === 'pong') {
           return;
         }
 